@@ -0,0 +1,241 @@
+"""
+Admission control and load shedding for inference requests.
+
+Requests enter a bounded priority queue with a deadline. Worker threads
+serve interactive requests before bulk ones and discard any request
+whose deadline will pass before it could finish instead of spending
+model time on an answer nobody is waiting for. When the queue is full a request is
+rejected immediately with a retry hint (an interactive request may
+evict the newest queued bulk request instead).
+
+Service time is estimated separately per priority class, since each
+class carries a different kind of work (interactive predictions take
+milliseconds, bulk explanations seconds).
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# -------------------------------
+# 1. CONFIGURATION
+# -------------------------------
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+PRIORITIES = {INTERACTIVE: 0, BULK: 1}       # Lower value is served first
+DEFAULT_TIMEOUTS = {INTERACTIVE: 5.0, BULK: 60.0}  # Seconds
+MIN_RETRY_AFTER = 1.0
+
+# -------------------------------
+# 2. ERRORS
+# -------------------------------
+
+class Overloaded(Exception):
+    """Raised when a request is shed; ``retry_after`` is a hint in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before it is served."""
+
+# -------------------------------
+# 3. CONTROLLER
+# -------------------------------
+
+class _Request:
+    __slots__ = ("payload", "priority", "deadline", "future", "abandoned", "finished")
+
+    def __init__(self, payload, priority, deadline):
+        self.payload = payload
+        self.priority = priority
+        self.deadline = deadline
+        self.future = Future()
+        self.abandoned = False  # Caller gave up while the request was running
+        self.finished = False   # Worker has counted the outcome
+
+def _reject(request, error):
+    """Fail a request unless its caller has already given up on it."""
+    if request.future.set_running_or_notify_cancel():
+        request.future.set_exception(error)
+
+class AdmissionController:
+    """
+    Bounded, deadline-aware priority queue in front of a handler.
+
+    Args:
+        handler: Callable run on a worker thread with each request's payload
+        max_queue: Maximum number of queued (not yet running) requests
+        workers: Number of worker threads calling ``handler``
+        timeouts: Default deadline in seconds per priority class
+    """
+
+    def __init__(self, handler, max_queue=64, workers=1, timeouts=None):
+        self.handler = handler
+        self.max_queue = max_queue
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._service_time = {p: 0.05 for p in PRIORITIES}  # EWMA of handler time, seconds
+        self._counts = {
+            p: {"served": 0, "late": 0, "rejected": 0, "evicted": 0, "expired": 0,
+                "timed_out": 0, "failed": 0}
+            for p in PRIORITIES
+        }
+        self._workers = [
+            threading.Thread(target=self._run, name=f"admission-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, payload, priority=INTERACTIVE, timeout=None):
+        """
+        Queue a request and wait for its result.
+
+        Args:
+            payload: Passed unchanged to ``handler``
+            priority: ``"interactive"`` or ``"bulk"``
+            timeout: Seconds until the deadline (defaults per priority)
+
+        Raises:
+            Overloaded: The queue is full; retry after ``retry_after`` seconds
+            DeadlineExceeded: The deadline passed before the request was served
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        if timeout is None:
+            timeout = self.timeouts[priority]
+
+        request = _Request(payload, priority, time.monotonic() + timeout)
+        self._admit(request)
+
+        try:
+            return request.future.result(timeout=max(request.deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            pass
+
+        if request.future.cancel():
+            # Still queued: the worker will skip it when popped
+            self._count(priority, "timed_out")
+        else:
+            with self._cond:
+                if request.finished:
+                    # Completed just as the deadline passed; hand over the outcome
+                    return request.future.result()
+                # Running: the worker counts it as "late" when it completes
+                request.abandoned = True
+        raise DeadlineExceeded(f"Request not served within {timeout:.1f}s")
+
+    def stats(self):
+        """Served/shed counters, service time and retry hint per priority plus queue depth."""
+        with self._cond:
+            return {
+                "queued": len(self._heap),
+                "max_queue": self.max_queue,
+                "service_time_ms": {p: t * 1000 for p, t in self._service_time.items()},
+                "retry_after": {p: self._retry_after(p) for p in PRIORITIES},
+                "priorities": {p: dict(c) for p, c in self._counts.items()},
+            }
+
+    def close(self):
+        """Stop the workers and reject everything still queued."""
+        with self._cond:
+            self._closed = True
+            pending, self._heap = self._heap, []
+            self._cond.notify_all()
+        for _, _, _, request in pending:
+            _reject(request, Overloaded("Service shutting down", MIN_RETRY_AFTER))
+        for worker in self._workers:
+            worker.join()
+
+    def _admit(self, request):
+        with self._cond:
+            if self._closed:
+                raise Overloaded("Service shutting down", MIN_RETRY_AFTER)
+            if len(self._heap) >= self.max_queue:
+                victim = self._evict_for(request)
+                if victim is None:
+                    self._counts[request.priority]["rejected"] += 1
+                    raise Overloaded("Server overloaded", self._retry_after(request.priority))
+                self._counts[victim.priority]["evicted"] += 1
+                _reject(
+                    victim,
+                    Overloaded("Shed for higher priority work", self._retry_after(victim.priority))
+                )
+            heapq.heappush(
+                self._heap,
+                (PRIORITIES[request.priority], request.deadline, next(self._seq), request)
+            )
+            self._cond.notify()
+
+    def _evict_for(self, request):
+        """Remove and return the newest queued request of lower priority, if any."""
+        rank = PRIORITIES[request.priority]
+        candidates = [entry for entry in self._heap if entry[0] > rank]
+        if not candidates:
+            return None
+        victim = max(candidates, key=lambda entry: (entry[0], entry[2]))
+        self._heap.remove(victim)
+        heapq.heapify(self._heap)
+        return victim[3]
+
+    def _retry_after(self, priority):
+        """Estimated seconds until the queued work served before ``priority`` drains."""
+        rank = PRIORITIES[priority]
+        backlog = sum(
+            self._service_time[request.priority]
+            for entry_rank, _, _, request in self._heap if entry_rank <= rank
+        ) / len(self._workers)
+        return max(MIN_RETRY_AFTER, round(backlog, 1))
+
+    def _count(self, priority, key):
+        with self._cond:
+            self._counts[priority][key] += 1
+
+    def _finish(self, request, key):
+        """Count a started request's outcome, unless its caller already left."""
+        with self._cond:
+            if request.abandoned and key == "served":
+                key = "late"
+            self._counts[request.priority][key] += 1
+            request.finished = True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                _, _, _, request = heapq.heappop(self._heap)
+
+            # Marking the future running also stops the caller cancelling it
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            # Skip work that cannot finish before its deadline
+            if request.deadline - time.monotonic() < self._service_time[request.priority]:
+                self._finish(request, "expired")
+                request.future.set_exception(DeadlineExceeded("Deadline would pass before completion"))
+                continue
+
+            start = time.monotonic()
+            try:
+                result = self.handler(request.payload)
+            except Exception as e:
+                self._finish(request, "failed")
+                request.future.set_exception(e)
+                continue
+            elapsed = time.monotonic() - start
+
+            with self._cond:
+                estimate = self._service_time[request.priority]
+                self._service_time[request.priority] = 0.8 * estimate + 0.2 * elapsed
+            self._finish(request, "served")
+            request.future.set_result(result)
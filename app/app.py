@@ -2,14 +2,34 @@
 import streamlit as st
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
-import torch.nn.functional as F
+import numpy as np
 import os
+import sys
 from pathlib import Path
 
+# Streamlit puts this script's directory first on sys.path, where `app`
+# would resolve to this file; put the project root first so it resolves
+# to the app package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import profiling
+from app.admission import DeadlineExceeded, Overloaded
+from app.explain import highlight_html
+from app.utils import admit_explain, admit_predict, clean_text, use_model
+
+# Watch PROFILE_DIR/arm so profiling can be armed on the running server
+profiling.init()
+
 # Hugging Face model ID - update this with your Hugging Face username/model name
 # This will be used as fallback when local model files are not available (e.g., on Streamlit Cloud)
 HUGGING_FACE_MODEL_ID = os.getenv("HUGGING_FACE_MODEL_ID", "recklessme/mh_3class_distil_final")
 
+# Local checkpoint directory under models/base_model/ (e.g. a pruned copy from prune_vocab.py)
+LOCAL_MODEL_NAME = os.getenv("LOCAL_MODEL_NAME", "mh_3class_distil_final")
+
+# Seconds to wait for a word-importance explanation before giving up on it
+EXPLAIN_TIMEOUT = float(os.getenv("EXPLAIN_TIMEOUT", "10"))
+
 # Page configuration
 st.set_page_config(
     page_title="Mental Health Detector",
@@ -42,21 +62,21 @@ def get_model_path():
     try:
         current_file = Path(__file__).resolve()  # app/app.py
         project_root = current_file.parent.parent  # Go up from app/ to project root
-        model_path = project_root / "models" / "base_model" / "mh_3class_distil_final"
+        model_path = project_root / "models" / "base_model" / LOCAL_MODEL_NAME
         if model_path.exists() and (model_path / "model.safetensors").exists():
             return str(model_path.resolve())  # Return absolute path
     except Exception as e:
         print(f"Error resolving path from __file__: {e}")
     
     # Fallback to relative path (convert to absolute)
-    model_path_str = "models/base_model/mh_3class_distil_final"
+    model_path_str = f"models/base_model/{LOCAL_MODEL_NAME}"
     model_path = Path(model_path_str)
     if model_path.exists() and (model_path / "model.safetensors").exists():
         return str(model_path.resolve())  # Return absolute path
     
     # Last resort: try current working directory
     try:
-        cwd_model_path = Path.cwd() / "models" / "base_model" / "mh_3class_distil_final"
+        cwd_model_path = Path.cwd() / "models" / "base_model" / LOCAL_MODEL_NAME
         if cwd_model_path.exists() and (cwd_model_path / "model.safetensors").exists():
             return str(cwd_model_path.resolve())  # Return absolute path
     except Exception as e:
@@ -180,46 +200,21 @@ text = st.text_area(
 col1, col2 = st.columns([1, 4])
 with col1:
     analyze_button = st.button("🔍 Analyze", type="primary", use_container_width=True)
-
-import re
-
-def clean_text(text: str) -> str:
-    """Clean text to match training preprocessing"""
-    text = str(text).lower()
-    text = re.sub(r"http\S+|www\S+|https\S+", '', text)
-    text = re.sub(r'@\w+', '', text)
-    text = re.sub(r'[^a-z\s]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+with col2:
+    explain_words = st.checkbox("🔎 Explain which words drove the prediction (slower)")
 
 if analyze_button:
     if not text.strip():
         st.warning("⚠️ Please enter some text to analyze.")
     else:
         try:
-            # Load model
+            # Load model and serve it through the shared admission queue
             model, tokenizer, device = load_model()
+            use_model(model, tokenizer)
             
             # Preprocess text
             cleaned_text = clean_text(text)
             
-            # Tokenize input
-            with st.spinner("🔄 Processing..."):
-                inputs = tokenizer(
-                    cleaned_text,
-                    return_tensors="pt",
-                    truncation=True,
-                    padding=True,
-                    max_length=128
-                )
-                inputs = {k: v.to(device) for k, v in inputs.items()}
-                
-                # Get prediction
-                with torch.no_grad():
-                    outputs = model(**inputs)
-                    logits = outputs.logits
-                    probs = F.softmax(logits, dim=-1).cpu().numpy()[0]
-            
             # Labels mapping
             labels = ["normal", "stress_anxiety", "depressed"]
             label_display = {
@@ -228,6 +223,11 @@ if analyze_button:
                 "depressed": "Depressed"
             }
             
+            # Get prediction (fails fast with Overloaded when the server is busy)
+            with st.spinner("🔄 Processing..."):
+                result = admit_predict(cleaned_text)
+            probs = np.array([result["probabilities"][label_display[label]] for label in labels])
+            
             idx = probs.argmax()
             predicted_label = labels[idx]
             confidence = probs[idx]
@@ -264,7 +264,7 @@ if analyze_button:
             with st.expander("📋 View Detailed Probabilities"):
                 for label, prob in zip(labels, probs):
                     st.progress(float(prob), text=f"{label_display[label]}: {prob*100:.2f}%")
-            
+
             # Suggestions
             st.markdown("### 💡 Suggestions")
             suggestions = {
@@ -295,7 +295,28 @@ if analyze_button:
             # Disclaimer
             st.markdown("---")
             st.caption("⚠️ **Disclaimer**: This tool is for educational/research purposes only and should not replace professional medical advice or diagnosis.")
+
+            # Word importance (bulk work, only on request and after the suggestions are shown)
+            if explain_words:
+                st.markdown("### 🔎 Why this prediction?")
+                if cleaned_text:
+                    try:
+                        with st.spinner("🔄 Computing word importance..."):
+                            explanation = admit_explain(cleaned_text, timeout=EXPLAIN_TIMEOUT)
+                        st.markdown(highlight_html(explanation["words"]), unsafe_allow_html=True)
+                        st.caption(
+                            f"Red words push towards **{explanation['label']}**, "
+                            "blue words push away from it."
+                        )
+                    except (Overloaded, DeadlineExceeded):
+                        st.info("⏳ Word importance is skipped while the server is busy.")
+                else:
+                    st.info("No words left to explain after cleaning.")
             
+        except Overloaded as e:
+            st.warning(f"⏳ The server is busy right now. Please try again in {e.retry_after:.0f} seconds.")
+        except DeadlineExceeded:
+            st.warning("⏳ The server took too long to respond. Please try again in a few seconds.")
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")
             st.error("Please try again or check if the model files are properly configured.")
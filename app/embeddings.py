@@ -0,0 +1,256 @@
+"""
+Sentence embeddings and an in-memory similarity index.
+
+``encode_texts_with_embeddings`` runs the classifier once per batch and
+keeps the encoder's pooled 768-dim representation alongside the label
+probabilities. ``VectorIndex`` stores those embeddings compactly
+(float16, or int8 with a per-row scale; L2-normalised) so past messages similar to a flagged
+one can be found with a single matrix-vector product, and can be saved
+to and memory-mapped back from ``.npy`` files.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+# -------------------------------
+# 1. EMBEDDING EXTRACTION
+# -------------------------------
+
+def _pool(hidden_state, attention_mask, pooling):
+    if pooling == "cls":
+        # Same vector the classification head reads
+        return hidden_state[:, 0]
+    if pooling == "mean":
+        mask = attention_mask.unsqueeze(-1).to(hidden_state.dtype)
+        return (hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+    raise ValueError(f"Unknown pooling '{pooling}' (expected 'cls' or 'mean')")
+
+def encode_texts_with_embeddings(model, tokenizer, texts, device=None, batch_size=32,
+                                 max_length=128, pooling="mean"):
+    """
+    Classify texts and return their pooled encoder embeddings.
+
+    Args:
+        model: Sequence classification model (in eval mode)
+        tokenizer: Matching tokenizer
+        texts: List of (cleaned) text strings
+        device: Torch device the model lives on (defaults to the model's)
+        batch_size: Texts per forward pass
+        max_length: Truncation length in tokens
+        pooling: "mean" over non-padding tokens, or "cls" for the first token
+
+    Returns:
+        (probabilities, embeddings): float32 arrays of shape
+        (len(texts), num_labels) and (len(texts), hidden_size)
+    """
+    if device is None:
+        device = next(model.parameters()).device
+
+    all_probs = []
+    all_embeddings = []
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(
+            list(texts[start:start + batch_size]),
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+            max_length=max_length
+        )
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+
+        with torch.no_grad():
+            outputs = model(**inputs, output_hidden_states=True)
+            probs = F.softmax(outputs.logits, dim=-1)
+            pooled = _pool(outputs.hidden_states[-1], inputs["attention_mask"], pooling)
+
+        all_probs.append(probs.cpu().numpy())
+        all_embeddings.append(pooled.float().cpu().numpy())
+
+    if not all_probs:
+        num_labels = model.config.num_labels
+        hidden_size = model.config.hidden_size
+        return np.zeros((0, num_labels), np.float32), np.zeros((0, hidden_size), np.float32)
+    return np.concatenate(all_probs), np.concatenate(all_embeddings)
+
+# -------------------------------
+# 2. VECTOR INDEX
+# -------------------------------
+
+INT8_LEVELS = 127.0     # Each row's max-abs component maps to +/-127
+SEARCH_CHUNK = 65536    # Rows scored per matmul during search
+
+class VectorIndex:
+    """
+    Cosine-similarity index over L2-normalised vectors.
+
+    Args:
+        dim: Vector dimension (768 for DistilBERT)
+        dtype: Storage type, "float16" (2 bytes/value) or "int8" (1 byte/value
+            plus one float32 scale per row)
+    """
+
+    def __init__(self, dim, dtype="float16"):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported dtype '{dtype}' (expected 'float16' or 'int8')")
+        self.dim = dim
+        self.dtype = dtype
+        self._vectors = np.zeros((0, dim), dtype=dtype)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._scales = np.ones(0, dtype=np.float32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._size]
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    def add(self, embeddings, ids=None):
+        """
+        Append embeddings to the index.
+
+        Args:
+            embeddings: Array of shape (n, dim)
+            ids: Optional integer ids (default: consecutive row numbers)
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        n = embeddings.shape[0]
+        if ids is None:
+            ids = np.arange(self._size, self._size + n, dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if ids.shape[0] != n:
+            raise ValueError(f"Got {n} embeddings but {ids.shape[0]} ids")
+
+        self._reserve(self._size + n)
+        codes, scales = self._quantize(_normalize(embeddings))
+        self._vectors[self._size:self._size + n] = codes
+        self._scales[self._size:self._size + n] = scales
+        self._ids[self._size:self._size + n] = ids
+        self._size += n
+
+    def search(self, queries, k=10):
+        """
+        Top-k cosine search.
+
+        Args:
+            queries: Array of shape (dim,) or (m, dim)
+            k: Number of neighbours per query
+
+        Returns:
+            (scores, ids): arrays of shape (m, k') with k' = min(k, len(index)),
+            sorted by decreasing similarity
+        """
+        queries = _normalize(np.asarray(queries, dtype=np.float32).reshape(-1, self.dim))
+        k = min(k, self._size)
+        if k == 0:
+            empty = np.zeros((queries.shape[0], 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+
+        best_scores = np.full((queries.shape[0], 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((queries.shape[0], 0), dtype=np.int64)
+        for start in range(0, self._size, SEARCH_CHUNK):
+            end = min(start + SEARCH_CHUNK, self._size)
+            block = self._dequantize(self._vectors[start:end], self._scales[start:end])
+            scores = queries @ block.T
+            rows = np.broadcast_to(np.arange(start, start + block.shape[0]), scores.shape)
+
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return best_scores, self._ids[best_rows]
+
+    def save(self, path):
+        """
+        Write the index to a directory as ``vectors.npy``, ``ids.npy``,
+        ``scales.npy`` (int8 only) and ``index.json``.
+
+        Files are written to temporaries and renamed into place, so saving
+        over the directory this index was memory-mapped from is safe.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        _atomic_save(path / "vectors.npy", self.vectors)
+        _atomic_save(path / "ids.npy", self.ids)
+        if self.dtype == "int8":
+            _atomic_save(path / "scales.npy", self._scales[:self._size])
+        tmp = path / "index.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "size": self._size}, f)
+        os.replace(tmp, path / "index.json")
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load an index written by ``save``.
+
+        With ``mmap=True`` the vectors stay on disk and are paged in on
+        demand; the first ``add`` copies them into memory.
+        """
+        path = Path(path)
+        with open(path / "index.json") as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], meta["dtype"])
+        mmap_mode = "r" if mmap else None
+        index._vectors = np.load(path / "vectors.npy", mmap_mode=mmap_mode)
+        index._ids = np.load(path / "ids.npy", mmap_mode=mmap_mode)
+        if meta["dtype"] == "int8":
+            index._scales = np.load(path / "scales.npy", mmap_mode=mmap_mode)
+        else:
+            index._scales = np.ones(meta["size"], dtype=np.float32)
+        index._size = meta["size"]
+        return index
+
+    def _reserve(self, capacity):
+        """Grow the backing arrays geometrically (and off any memory map)."""
+        writable = not isinstance(self._vectors, np.memmap) and self._vectors.flags.writeable
+        if capacity <= self._vectors.shape[0] and writable:
+            return
+        new_capacity = max(capacity, 2 * self._vectors.shape[0], 1024)
+        vectors = np.zeros((new_capacity, self.dim), dtype=self.dtype)
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        scales = np.ones(new_capacity, dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        scales[:self._size] = self._scales[:self._size]
+        self._vectors, self._ids, self._scales = vectors, ids, scales
+
+    def _quantize(self, unit_vectors):
+        """Return (stored codes, per-row scales)."""
+        if self.dtype == "int8":
+            # Per-row scale: 768-dim unit vectors have components around
+            # 0.04, which a fixed 1/127 step would crush to a few levels
+            scales = np.abs(unit_vectors).max(axis=1) / INT8_LEVELS
+            scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+            codes = np.clip(np.rint(unit_vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return codes, scales
+        return unit_vectors.astype(np.float16), np.ones(unit_vectors.shape[0], dtype=np.float32)
+
+    def _dequantize(self, stored, scales):
+        if self.dtype == "int8":
+            return stored.astype(np.float32) * scales[:, None]
+        return stored.astype(np.float32)
+
+def _atomic_save(path, array):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,323 @@
+"""
+On-demand profiling of live inference calls.
+
+Profiling is off by default and costs one global check per call while
+off. Importing this module starts nothing; serving entry points call
+``init()`` to enable the runtime triggers below. It can be armed to
+capture the next N inference calls:
+
+- at startup with ``PROFILE_NEXT_CALLS=N``
+- at runtime by writing N to the trigger file ``PROFILE_DIR/arm``
+  (``echo 20 > profiles/arm``); it is polled once a second and removed
+  when picked up. This works under Streamlit, whose script thread cannot
+  install signal handlers
+- at runtime by sending ``SIGUSR1`` (captures ``PROFILE_CALLS`` calls),
+  only when ``init()`` ran on the main thread; otherwise the handler is
+  not installed and the signal terminates the process
+- from code, e.g. an admin endpoint, with ``arm(n)``
+
+Each captured call runs under its own torch.profiler, entered and exited
+on the calling thread, plus a Python stack sampler. The following files
+are written to ``PROFILE_DIR``:
+
+- ``trace_<ts>_<i>.json``: Chrome trace of call i (chrome://tracing or Perfetto)
+- ``torch_stacks_<ts>.folded``: operator stacks of all calls for flamegraph.pl / speedscope
+- ``python_stacks_<ts>.folded``: sampled Python stacks, same format
+- ``operators_<ts>.txt``: top operators by self time over all calls, grouped by input shape
+
+Traces are written as each call finishes; the merged files when the last
+call finishes.
+"""
+import contextlib
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import torch
+from torch.profiler import ProfilerActivity, profile, record_function
+
+try:
+    # Without verbose=True, export_stacks() writes an empty file on recent torch
+    from torch._C._profiler import _ExperimentalConfig
+    _PROFILER_CONFIG = _ExperimentalConfig(verbose=True)
+except (ImportError, TypeError):
+    _PROFILER_CONFIG = None
+
+# -------------------------------
+# 1. CONFIGURATION
+# -------------------------------
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_CALLS = int(os.getenv("PROFILE_CALLS", "20"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # Seconds
+TRIGGER_FILE = os.getenv("PROFILE_TRIGGER_FILE", str(PROFILE_DIR / "arm"))  # Empty to disable
+TRIGGER_POLL = 1.0  # Seconds
+TOP_OPERATORS = 30
+
+_NULL = contextlib.nullcontext()
+_lock = threading.Lock()
+_remaining = 0      # Calls left to capture; 0 means disabled
+_session = None
+_watcher = None
+_initialized = False
+
+# -------------------------------
+# 2. CONTROL
+# -------------------------------
+
+# arm() only assigns _remaining (no lock) so it is safe to call from a
+# signal handler that interrupts a captured call holding _lock.
+
+def arm(calls=PROFILE_CALLS):
+    """Capture the next ``calls`` inference calls."""
+    global _remaining
+    _remaining = max(int(calls), 0)
+    print(f"[INFO] Profiling armed for the next {calls} inference calls")
+
+def disarm():
+    """
+    Stop capturing and write out what has been captured so far.
+
+    Waits for a call that is being captured to finish. Not safe to call
+    from a signal handler.
+    """
+    global _remaining, _session
+    _remaining = 0
+    with _lock:
+        session, _session = _session, None
+    if session is not None:
+        session.finish()
+
+def is_armed():
+    return _remaining > 0
+
+def _handle_signal(signum, frame):
+    arm(PROFILE_CALLS)
+
+def install_signal_handler(signum=getattr(signal, "SIGUSR1", None)):
+    """Arm profiling on ``signum``. Only works on the main thread of a POSIX process."""
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, _handle_signal)
+    return True
+
+def _watch_trigger(path):
+    while True:
+        time.sleep(TRIGGER_POLL)
+        try:
+            if not path.exists():
+                continue
+            content = path.read_text().strip()
+            path.unlink()
+            arm(int(content) if content else PROFILE_CALLS)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring profiling trigger {path}: {e}")
+            with contextlib.suppress(OSError):
+                path.unlink()
+
+def start_trigger_watcher(path=TRIGGER_FILE):
+    """Arm profiling when ``path`` appears (its content is the number of calls)."""
+    global _watcher
+    if not path or _watcher is not None:
+        return False
+    _watcher = threading.Thread(
+        target=_watch_trigger, args=(Path(path),), name="profile-trigger", daemon=True
+    )
+    _watcher.start()
+    return True
+
+def init():
+    """
+    Enable the runtime triggers: the trigger file watcher and, on the
+    main thread, the ``SIGUSR1`` handler. Safe to call more than once.
+    """
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+    install_signal_handler()
+    start_trigger_watcher()
+
+# -------------------------------
+# 3. CAPTURE
+# -------------------------------
+
+def capture():
+    """
+    Context manager around one inference call.
+
+    Returns a shared no-op context while profiling is disabled.
+    """
+    if not _remaining:
+        return _NULL
+    return _capture()
+
+def region(name):
+    """Label a section (e.g. "tokenizer") in the trace; no-op unless a capture is running."""
+    if _session is None:
+        return _NULL
+    return record_function(name)
+
+@contextlib.contextmanager
+def _capture():
+    global _remaining, _session
+    # Captured calls are serialized so each trace shows one call at a time
+    with _lock:
+        if not _remaining:
+            yield
+            return
+        if _session is None:
+            _session = _Session()
+        profiler = _start_profiler()
+        if profiler is None:
+            _remaining = 0
+            session, _session = _session, None
+            if session.calls:
+                session.finish()
+            else:
+                session.sampler.stop()
+            yield
+            return
+
+        _session.sampler.thread_id = threading.get_ident()
+        try:
+            with record_function("inference_call"):
+                yield
+        finally:
+            _session.sampler.thread_id = None
+            try:
+                profiler.__exit__(None, None, None)
+                _session.add(profiler)
+            except Exception as e:
+                print(f"[WARN] Failed to record profiled call: {e}")
+            _remaining -= 1
+            if _remaining <= 0:
+                _remaining = 0
+                session, _session = _session, None
+                session.finish()
+
+def _start_profiler():
+    """Start a profiler on the calling thread, or return None if it cannot start."""
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    profiler = profile(
+        activities=activities, record_shapes=True, with_stack=True, experimental_config=_PROFILER_CONFIG
+    )
+    try:
+        profiler.__enter__()
+    except Exception as e:
+        print(f"[WARN] Profiling disabled, profiler failed to start: {e}")
+        return None
+    return profiler
+
+# -------------------------------
+# 4. SESSION
+# -------------------------------
+
+class _StackSampler:
+    """Samples the Python stack of one thread at a fixed interval."""
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            thread_id = self.thread_id
+            if thread_id is None:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+class _Session:
+    """Accumulates the per-call profiles of one armed capture."""
+
+    def __init__(self):
+        self.started = time.strftime("%Y%m%d_%H%M%S")
+        self.sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+        self.calls = 0
+        self.torch_stacks = Counter()
+        self.operators = {}     # (name, input shapes) -> [count, self CPU, total CPU, self device] in us
+        self.sampler = _StackSampler()  # Pointed at the captured thread during each call
+
+    def add(self, profiler):
+        """Write the trace of one finished call and merge its stacks and operators."""
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        profiler.export_chrome_trace(str(PROFILE_DIR / f"trace_{self.started}_{self.calls:03d}.json"))
+        self.calls += 1
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "stacks.folded"
+            profiler.export_stacks(str(path), self.sort_by)
+            with open(path) as f:
+                for line in f:
+                    stack, _, value = line.rstrip("\n").rpartition(" ")
+                    if stack:
+                        self.torch_stacks[stack] += int(value)
+
+        for event in profiler.key_averages(group_by_input_shape=True):
+            row = self.operators.setdefault((event.key, str(event.input_shapes)), [0, 0.0, 0.0, 0.0])
+            row[0] += event.count
+            row[1] += event.self_cpu_time_total
+            row[2] += event.cpu_time_total
+            row[3] += event.self_device_time_total
+
+    def finish(self):
+        self.sampler.stop()
+        try:
+            self._write()
+        except Exception as e:
+            print(f"[WARN] Failed to write profile: {e}")
+
+    def _write(self):
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = self.started
+
+        with open(PROFILE_DIR / f"torch_stacks_{stamp}.folded", "w") as f:
+            for stack, value in self.torch_stacks.most_common():
+                f.write(f"{stack} {value}\n")
+
+        with open(PROFILE_DIR / f"python_stacks_{stamp}.folded", "w") as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        column = 3 if torch.cuda.is_available() else 1
+        rows = sorted(self.operators.items(), key=lambda item: item[1][column], reverse=True)
+        with open(PROFILE_DIR / f"operators_{stamp}.txt", "w") as f:
+            f.write(f"Top operators over {self.calls} calls (times in ms)\n")
+            f.write(f"{'Name':<40} {'Calls':>7} {'Self CPU':>10} {'CPU total':>10} {'Self device':>12}  Input shapes\n")
+            for (name, shapes), (count, self_cpu, cpu, self_device) in rows[:TOP_OPERATORS]:
+                f.write(
+                    f"{name[:40]:<40} {count:>7} {self_cpu / 1000:>10.3f} {cpu / 1000:>10.3f} "
+                    f"{self_device / 1000:>12.3f}  {shapes}\n"
+                )
+
+        print(f"[INFO] Profile of {self.calls} calls written to {PROFILE_DIR.resolve()} ({stamp})")
+
+# -------------------------------
+# 5. STARTUP
+# -------------------------------
+
+if int(os.getenv("PROFILE_NEXT_CALLS", "0")) > 0:
+    arm(int(os.getenv("PROFILE_NEXT_CALLS")))
@@ -0,0 +1,318 @@
+"""
+Multi-model serving with shadow models.
+
+One primary model answers every request on the caller's thread. Any
+number of shadow models (e.g. a retrained checkpoint waiting to be
+promoted) see the same tokenized inputs, each in its own worker process
+behind a bounded queue. Shadow work is kept off the primary's CPU budget:
+
+- each shadow process runs with ``SHADOW_THREADS`` intra-op threads in
+  the ``SCHED_IDLE`` scheduling class (a raised nice value where that is
+  unavailable), so it only gets CPU time the primary is not using
+- a shadow only starts a job while no primary call is in flight, and
+  aborts (``preempted``) at the next linear layer if one arrives
+- jobs are dropped rather than queued when a shadow falls behind
+
+``benchmarks/shadow_latency.py`` compares primary p99 with shadows on and
+off.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+# -------------------------------
+# 1. STATISTICS
+# -------------------------------
+
+LATENCY_WINDOW = 1000   # Latency samples kept per model
+
+class ModelStats:
+    """Rolling latency and shadow-vs-primary disagreement counters."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.compared = 0
+        self.disagreements = 0
+        self.prob_diff_sum = 0.0
+        self.dropped = 0
+        self.preempted = 0
+        self.errors = 0
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.calls += 1
+
+    def record_comparison(self, probs, primary_probs):
+        """Compare a shadow's probabilities with the primary's for the same rows."""
+        disagree = (probs.argmax(dim=-1) != primary_probs.argmax(dim=-1)).sum().item()
+        diff = (probs - primary_probs).abs().sum(dim=-1).sum().item()
+        with self._lock:
+            self.compared += probs.shape[0]
+            self.disagreements += disagree
+            self.prob_diff_sum += diff
+
+    def record_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def record_preempted(self):
+        with self._lock:
+            self.preempted += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        """Return a plain dict of the current statistics."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            summary = {
+                "calls": self.calls,
+                "dropped": self.dropped,
+                "preempted": self.preempted,
+                "errors": self.errors,
+                "compared": self.compared,
+                "disagreement_rate": self.disagreements / self.compared if self.compared else 0.0,
+                "mean_prob_diff": self.prob_diff_sum / self.compared if self.compared else 0.0,
+            }
+        summary["p50_ms"] = _percentile(latencies, 0.50) * 1000
+        summary["p99_ms"] = _percentile(latencies, 0.99) * 1000
+        return summary
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+# -------------------------------
+# 2. SHADOW WORKER
+# -------------------------------
+
+SHADOW_THREADS = int(os.getenv("SHADOW_THREADS", "1"))
+SHADOW_NICE = int(os.getenv("SHADOW_NICE", "10"))
+IDLE_POLL = 0.001   # Seconds between checks while the primary is busy
+
+class _Preempted(Exception):
+    """Raised inside a shadow forward pass when a primary call arrives."""
+
+def _forward(model, inputs, device):
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+    with torch.no_grad():
+        logits = model(**inputs).logits
+    return F.softmax(logits, dim=-1).cpu()
+
+def _add_preemption_hooks(model, primary_busy):
+    """Abort the forward pass before any linear layer while the primary is busy."""
+    def check(module, args):
+        if primary_busy.value:
+            raise _Preempted()
+
+    for module in model.modules():
+        if isinstance(module, nn.Linear):
+            module.register_forward_pre_hook(check)
+
+def _shadow_main(path, jobs, results, primary_busy, num_threads, niceness):
+    """Entry point of a shadow process."""
+    from transformers import AutoModelForSequenceClassification
+
+    torch.set_num_threads(num_threads)
+    try:
+        # Linux: only run when the CPU would otherwise be idle
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    except (AttributeError, OSError):
+        try:
+            os.nice(niceness)
+        except (AttributeError, OSError):
+            pass
+
+    model = AutoModelForSequenceClassification.from_pretrained(path)
+    model.eval()
+    _add_preemption_hooks(model, primary_busy)
+    device = torch.device("cpu")
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        inputs, primary_probs = job
+        while primary_busy.value:
+            time.sleep(IDLE_POLL)
+        try:
+            start = time.perf_counter()
+            probs = _forward(model, {k: torch.from_numpy(v) for k, v in inputs.items()}, device)
+            results.put(("done", time.perf_counter() - start, probs.numpy(), primary_probs))
+        except _Preempted:
+            results.put(("preempted",))
+        except Exception as e:
+            results.put(("error", str(e)))
+
+class _ShadowWorker:
+    """A shadow model running in its own process, off the request path."""
+
+    def __init__(self, name, path, queue_size, primary_busy, num_threads, niceness):
+        self.name = name
+        self.path = path
+        self.stats = ModelStats()
+        context = multiprocessing.get_context("spawn")
+        self._jobs = context.Queue(maxsize=queue_size)
+        self._results = context.Queue()
+        self._process = context.Process(
+            target=_shadow_main,
+            args=(path, self._jobs, self._results, primary_busy, num_threads, niceness),
+            name=f"shadow-{name}",
+            daemon=True
+        )
+        self._process.start()
+        self._collector = threading.Thread(target=self._collect, name=f"shadow-{name}-stats", daemon=True)
+        self._collector.start()
+
+    def submit(self, inputs, primary_probs):
+        """Enqueue a job without blocking; drop it if the queue is full."""
+        try:
+            job = ({k: v.numpy() for k, v in inputs.items()}, primary_probs.numpy())
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            self.stats.record_drop()
+
+    def pending(self):
+        """Number of jobs waiting in the queue (None where the platform cannot tell)."""
+        try:
+            return self._jobs.qsize()
+        except NotImplementedError:
+            return None
+
+    def stop(self, timeout=5.0):
+        try:
+            self._jobs.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._results.put(None)
+        self._collector.join()
+
+    def _collect(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            kind = message[0]
+            if kind == "done":
+                _, seconds, probs, primary_probs = message
+                self.stats.record_latency(seconds)
+                self.stats.record_comparison(torch.from_numpy(probs), torch.from_numpy(primary_probs))
+            elif kind == "preempted":
+                self.stats.record_preempted()
+            else:
+                self.stats.record_error()
+                print(f"[WARN] Shadow model '{self.name}' failed: {message[1]}")
+
+# -------------------------------
+# 3. REGISTRY
+# -------------------------------
+
+class ModelRegistry:
+    """
+    Holds one primary model and any number of shadow models.
+
+    All models must share the primary's tokenizer (e.g. retrained
+    checkpoints of the same base model), so each request is tokenized
+    once and the same tensors are fed to every model.
+    """
+
+    def __init__(self, name, model, device=None):
+        self.primary_name = name
+        self.primary = model
+        self.device = device or next(model.parameters()).device
+        self.primary_stats = ModelStats()
+        self.shadows = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        # Lock-free flag: a shared lock could be held by a descheduled
+        # shadow process and stall the primary (priority inversion)
+        self._primary_busy = multiprocessing.get_context("spawn").RawValue("i", 0)
+
+    def add_shadow(self, name, path, queue_size=32, num_threads=SHADOW_THREADS,
+                   niceness=SHADOW_NICE):
+        """
+        Start a shadow model loaded from ``path`` in its own process.
+
+        Args:
+            name: Name used in ``stats()``
+            path: Local checkpoint directory or Hugging Face Hub model id
+            queue_size: Jobs buffered before new ones are dropped
+            num_threads: Intra-op threads the shadow process may use
+            niceness: Added to the shadow process's nice value (POSIX only)
+        """
+        if name == self.primary_name or name in self.shadows:
+            raise ValueError(f"Model '{name}' is already registered")
+        self.shadows[name] = _ShadowWorker(
+            name, path, queue_size, self._primary_busy, num_threads, niceness
+        )
+
+    def remove_shadow(self, name):
+        """Stop a shadow's worker process and unregister it."""
+        self.shadows.pop(name).stop()
+
+    def predict(self, inputs):
+        """
+        Run the primary model on tokenized inputs and fan out to shadows.
+
+        Args:
+            inputs: dict of CPU tensors as returned by the tokenizer
+
+        Returns:
+            Tensor of primary softmax probabilities, shape (batch, num_labels)
+        """
+        self._enter_primary()
+        try:
+            start = time.perf_counter()
+            probs = _forward(self.primary, inputs, self.device)
+            self.primary_stats.record_latency(time.perf_counter() - start)
+        finally:
+            self._exit_primary()
+
+        for worker in self.shadows.values():
+            worker.submit(inputs, probs)
+        return probs
+
+    def stats(self):
+        """Per-model statistics keyed by model name."""
+        report = {self.primary_name: {"role": "primary", **self.primary_stats.snapshot()}}
+        for name, worker in self.shadows.items():
+            report[name] = {
+                "role": "shadow",
+                "queued": worker.pending(),
+                **worker.stats.snapshot(),
+            }
+        return report
+
+    def close(self):
+        """Stop all shadow workers."""
+        for name in list(self.shadows):
+            self.remove_shadow(name)
+
+    def _enter_primary(self):
+        with self._lock:
+            self._in_flight += 1
+            self._primary_busy.value = 1
+
+    def _exit_primary(self):
+        with self._lock:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._primary_busy.value = 0
@@ -1,11 +1,17 @@
 import pandas as pd
 import re
 import torch
-import torch.nn.functional as F
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import os
+import threading
+
+from .explain import explain_texts
+from .serving import ModelRegistry
+from .admission import AdmissionController, BULK, INTERACTIVE
+from .embeddings import encode_texts_with_embeddings
+from . import profiling
 
 # -------------------------------
 # 1. DATA HANDLING
@@ -24,10 +30,13 @@ def split_data(df, test_size=0.2, random_state=42):
 # -------------------------------
 
 def clean_text(text):
-    """Remove links, symbols, and extra spaces."""
-    text = re.sub(r"http\S+", "", text)
-    text = re.sub(r"[^a-zA-Z\s]", "", text)
-    return text.lower().strip()
+    """Clean text to match training preprocessing: drop links, mentions, symbols and extra spaces."""
+    text = str(text).lower()
+    text = re.sub(r"http\S+|www\S+|https\S+", "", text)
+    text = re.sub(r"@\w+", "", text)
+    text = re.sub(r"[^a-z\s]", "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
 
 def preprocess_dataframe(df, text_col):
     """Apply text cleaning to entire dataframe."""
@@ -70,15 +79,26 @@ def log(message):
 # 6. MODEL LOADING AND INFERENCE
 # -------------------------------
 
-MODEL_PATH = "models/base_model/mh_3class_distil_final"
+MODEL_PATH = os.getenv("MODEL_PATH", "models/base_model/mh_3class_distil_final")
 LABEL_MAPPING = {
     "normal": "Normal",
     "stress_anxiety": "Stress/Anxiety",
     "depressed": "Depressed"
 }
 
+# Comma-separated "name=path" pairs of checkpoints to run in shadow mode
+SHADOW_MODELS = os.getenv("SHADOW_MODELS", "")
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "32"))
+
+# Admission control in front of predict()
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_WORKERS = int(os.getenv("ADMISSION_WORKERS", "1"))
+
 _tokenizer = None
 _model = None
+_registry = None
+_registry_lock = threading.Lock()
+_admission = None
 
 def load_tokenizer():
     """Load and return the tokenizer."""
@@ -95,10 +115,97 @@ def load_model():
         _model.eval()
     return _model
 
+def use_model(model, tokenizer):
+    """
+    Serve an already-loaded model and tokenizer instead of ``MODEL_PATH``.
+
+    Used by the Streamlit app, which loads (and caches) its own model with
+    a Hugging Face Hub fallback.
+    """
+    global _model, _tokenizer
+    with _registry_lock:
+        _model, _tokenizer = model, tokenizer
+        if _registry is not None and _registry.primary is not model:
+            _registry.primary = model
+            _registry.device = next(model.parameters()).device
+
+def load_registry():
+    """
+    Load and return the model registry.
+
+    The primary is the model from ``load_model``; shadows are read from
+    the ``SHADOW_MODELS`` environment variable.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModelRegistry("primary", load_model())
+                for entry in filter(None, (e.strip() for e in SHADOW_MODELS.split(","))):
+                    name, _, path = entry.partition("=")
+                    if not path:
+                        name, path = os.path.basename(entry.rstrip("/")), entry
+                    log(f"Starting shadow model '{name}' from {path}")
+                    registry.add_shadow(name, path, queue_size=SHADOW_QUEUE_SIZE)
+                _registry = registry
+    return _registry
+
+def model_stats():
+    """Per-model latency and shadow disagreement statistics."""
+    return load_registry().stats()
+
+def _run_admitted(payload):
+    func, arg = payload
+    return func(arg)
+
+def load_admission():
+    """Load and return the admission controller shared by ``admit_*`` calls."""
+    global _admission
+    if _admission is None:
+        with _registry_lock:
+            if _admission is None:
+                _admission = AdmissionController(
+                    _run_admitted,
+                    max_queue=ADMISSION_MAX_QUEUE,
+                    workers=ADMISSION_WORKERS
+                )
+    return _admission
+
+def admit_predict(text, priority=INTERACTIVE, timeout=None):
+    """
+    ``predict`` behind admission control.
+
+    Args:
+        text: Input text string
+        priority: "interactive" or "bulk"
+        timeout: Seconds the caller is willing to wait (defaults per priority)
+
+    Raises:
+        Overloaded: Queue is full; carries a ``retry_after`` hint in seconds
+        DeadlineExceeded: Not served before the deadline
+    """
+    return load_admission().submit((predict, text), priority=priority, timeout=timeout)
+
+def admit_explain(text, priority=BULK, timeout=None):
+    """
+    ``explain`` behind admission control.
+
+    Explanations cost many forward/backward passes, so they default to
+    the bulk class and are shed before predictions under load. Raises
+    the same errors as ``admit_predict``.
+    """
+    return load_admission().submit((explain, text), priority=priority, timeout=timeout)
+
+def admission_stats():
+    """Served versus shed request counts per priority."""
+    return load_admission().stats()
+
 def predict(text):
     """
     Predict mental health classification for given text.
     
+    The text is cleaned with ``clean_text`` first, as in training.
+    
     Args:
         text: Input text string
         
@@ -114,20 +221,21 @@ def predict(text):
         }
     """
     tokenizer = load_tokenizer()
-    model = load_model()
-    
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        padding=True,
-        max_length=128
-    )
+    registry = load_registry()
     
-    with torch.no_grad():
-        outputs = model(**inputs)
-        logits = outputs.logits
-        probabilities = F.softmax(logits, dim=-1).detach().numpy()[0]
+    with profiling.capture():
+        # Tokenized once and shared by the primary and every shadow model
+        with profiling.region("tokenizer"):
+            inputs = tokenizer(
+                clean_text(text),
+                return_tensors="pt",
+                truncation=True,
+                padding=True,
+                max_length=128
+            )
+        
+        with profiling.region("model_forward"):
+            probabilities = registry.predict(inputs).numpy()[0]
     
     label_ids = ["normal", "stress_anxiety", "depressed"]
     predicted_idx = probabilities.argmax()
@@ -144,3 +252,76 @@ def predict(text):
         "confidence": float(probabilities[predicted_idx]),
         "probabilities": probabilities_dict
     }
+
+def explain(texts, n_steps=20, batch_size=64):
+    """
+    Word-level attributions for one or many texts.
+
+    Texts are cleaned with ``clean_text`` before tokenization, so the
+    returned words are the cleaned words the model actually saw.
+
+    Args:
+        texts: Input text string or list of strings
+        n_steps: Integrated-gradients step budget per text
+        batch_size: Maximum rows per forward/backward pass
+
+    Returns:
+        dict (or list of dicts for a list input): {
+            "label": str,
+            "words": [(word, score), ...]
+        }
+    """
+    single = isinstance(texts, str)
+    if single:
+        texts = [texts]
+
+    tokenizer = load_tokenizer()
+    model = load_model()
+
+    cleaned = [clean_text(str(t)) for t in texts]
+    results = explain_texts(model, tokenizer, cleaned, n_steps=n_steps, batch_size=batch_size)
+
+    label_ids = ["normal", "stress_anxiety", "depressed"]
+    explanations = [
+        {
+            "label": LABEL_MAPPING[label_ids[r["label_index"]]],
+            "words": r["words"]
+        }
+        for r in results
+    ]
+    return explanations[0] if single else explanations
+
+def predict_with_embeddings(texts, batch_size=32, pooling="mean"):
+    """
+    Classify a batch of texts and return their pooled encoder embeddings.
+
+    Args:
+        texts: List of input text strings
+        batch_size: Texts per forward pass
+        pooling: "mean" or "cls"
+
+    Returns:
+        (predictions, embeddings): list of ``predict``-style dicts and a
+        float32 array of shape (len(texts), 768), ready for
+        ``VectorIndex.add``
+    """
+    tokenizer = load_tokenizer()
+    model = load_model()
+
+    cleaned = [clean_text(str(t)) for t in texts]
+    probabilities, embeddings = encode_texts_with_embeddings(
+        model, tokenizer, cleaned, batch_size=batch_size, pooling=pooling
+    )
+
+    label_ids = ["normal", "stress_anxiety", "depressed"]
+    predictions = []
+    for probs in probabilities:
+        predicted_idx = probs.argmax()
+        predictions.append({
+            "label": LABEL_MAPPING[label_ids[predicted_idx]],
+            "confidence": float(probs[predicted_idx]),
+            "probabilities": {
+                LABEL_MAPPING[label_id]: float(p) for label_id, p in zip(label_ids, probs)
+            }
+        })
+    return predictions, embeddings
@@ -0,0 +1,101 @@
+"""
+Compare primary-model latency with shadow models off and on.
+
+Sends the same request stream through a ModelRegistry twice, first with
+no shadows and then with ``--shadows`` copies of ``--shadow-path``
+attached, and prints p50/p99 of the primary for both runs together with
+the shadows' own statistics.
+
+Usage:
+    python benchmarks/shadow_latency.py
+    python benchmarks/shadow_latency.py --requests 2000 --interval 0.01 --shadows 2
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from app.serving import ModelRegistry
+
+MODEL_PATH = "models/base_model/mh_3class_distil_final"
+SAMPLE_TEXTS = [
+    "i have been feeling really stressed lately with all the work deadlines",
+    "had a great day at the park with my friends",
+    "i cant sleep and nothing feels worth doing anymore",
+    "exams are next week and i keep panicking about failing",
+    "just finished a good book and made dinner",
+    "i feel empty and tired all the time no matter what i do",
+]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+def run(registry, tokenizer, requests, interval, seed=0):
+    """Send ``requests`` single-text requests, ``interval`` seconds apart."""
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(requests):
+        text = " ".join(rng.choice(SAMPLE_TEXTS) for _ in range(rng.randint(1, 4)))
+        start = time.perf_counter()
+        inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=128)
+        registry.predict(inputs)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(interval)
+    return latencies
+
+def report(name, latencies):
+    print(
+        f"{name:<14} p50 {percentile(latencies, 0.50) * 1000:7.2f} ms   "
+        f"p99 {percentile(latencies, 0.99) * 1000:7.2f} ms   "
+        f"mean {statistics.mean(latencies) * 1000:7.2f} ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Primary p99 with and without shadow models.")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--shadow-path", default=None, help="Shadow checkpoint (default: --model-path)")
+    parser.add_argument("--shadows", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=0.02, help="Seconds between requests")
+    parser.add_argument("--warmup", type=int, default=50)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model_path)
+    model.eval()
+    print(f"torch threads: {torch.get_num_threads()}")
+
+    registry = ModelRegistry("primary", model)
+    run(registry, tokenizer, args.warmup, args.interval)
+    off = run(registry, tokenizer, args.requests, args.interval)
+
+    for i in range(args.shadows):
+        registry.add_shadow(f"shadow-{i}", args.shadow_path or args.model_path)
+    time.sleep(5)  # Let shadow processes load their models
+    run(registry, tokenizer, args.warmup, args.interval)
+    on = run(registry, tokenizer, args.requests, args.interval)
+    stats = registry.stats()
+    registry.close()
+
+    print()
+    report("shadows off", off)
+    report(f"shadows on ({args.shadows})", on)
+    print()
+    for name, model_stats in stats.items():
+        if model_stats["role"] == "shadow":
+            print(
+                f"{name}: calls {model_stats['calls']}, dropped {model_stats['dropped']}, "
+                f"preempted {model_stats['preempted']}, errors {model_stats['errors']}, "
+                f"disagreement {model_stats['disagreement_rate']:.3f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -41,6 +41,7 @@ st.markdown('<div class="main-header">🧠 Mental Health Detection System</div>'
 
 # Backend URL
 BACKEND_URL = "http://localhost:8000"
+REQUEST_TIMEOUT = 10  # Seconds; also sent as the request deadline
 
 # Ethical Disclaimer
 st.markdown("""
@@ -76,8 +77,8 @@ if analyze_button:
             try:
                 response = requests.post(
                     f"{BACKEND_URL}/predict",
-                    json={"text": text_input.strip()},
-                    timeout=10
+                    json={"text": text_input.strip(), "priority": "interactive", "timeout": REQUEST_TIMEOUT},
+                    timeout=REQUEST_TIMEOUT
                 )
                 
                 if response.status_code == 200:
@@ -137,6 +138,10 @@ if analyze_button:
                     }
                     st.dataframe(prob_data, use_container_width=True, hide_index=True)
                     
+                elif response.status_code in (429, 503):
+                    retry_after = response.headers.get("Retry-After", "a few")
+                    st.warning(f"⏳ The server is busy right now. Please try again in {retry_after} seconds.")
+                    
                 else:
                     st.error(f"❌ Error: {response.status_code} - {response.text}")
                     
@@ -0,0 +1,276 @@
+"""
+Shrink the deployed model by pruning its vocabulary to a corpus.
+
+The word-embedding table holds all 30522 WordPiece tokens, but production
+text only ever uses a fraction of them. This script tokenizes a corpus with
+the existing tokenizer, keeps every token that appears plus the special
+tokens, rewrites vocab.txt / tokenizer.json / tokenizer_config.json with the
+reduced vocabulary, slices the embedding matrix to match and saves a
+checkpoint that loads exactly like mh_3class_distil_final.
+
+The corpus is cleaned with app.utils.clean_text before scanning, exactly
+as app.utils.predict and the Streamlit app clean text before tokenizing,
+so the kept vocabulary covers what the serving code actually feeds the
+model. WordPiece picks the longest matching vocabulary entry, and every
+entry it picked on the corpus is kept, so the corpus tokenizes to the
+same pieces afterwards. The script checks this and that predictions are
+identical, and only writes the checkpoint when they are. Tokens never seen in the corpus become [UNK] in the pruned
+model.
+
+Usage:
+    python prune_vocab.py data/processed/corpus.csv --text-column text
+    python prune_vocab.py messages.txt --output models/base_model/mh_3class_distil_pruned
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import torch
+from torch import nn
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from app.utils import clean_text, load_data
+
+# Configuration
+SOURCE_MODEL_PATH = Path("models/base_model/mh_3class_distil_final")
+OUTPUT_MODEL_PATH = Path("models/base_model/mh_3class_distil_pruned")
+MAX_LENGTH = 128
+BATCH_SIZE = 64
+
+# -------------------------------
+# 1. CORPUS
+# -------------------------------
+
+def read_corpus(path, text_column):
+    """Read raw texts from a CSV column or a plain text file (one text per line)."""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        df = load_data(path)
+        if text_column not in df.columns:
+            raise ValueError(f"Column '{text_column}' not in {path} (found: {', '.join(df.columns)})")
+        texts = df[text_column].dropna().astype(str).tolist()
+    else:
+        with open(path, encoding="utf-8") as f:
+            texts = [line.rstrip("\n") for line in f]
+    return [t for t in texts if t.strip()]
+
+def serving_texts(texts):
+    """Apply the same preprocessing as app.utils.predict."""
+    return [clean_text(t) for t in texts]
+
+def collect_token_ids(tokenizer, texts):
+    """Every token id the tokenizer produces on the corpus (without truncation)."""
+    seen = set()
+    for start in range(0, len(texts), 1000):
+        encoded = tokenizer(texts[start:start + 1000], add_special_tokens=True)
+        for ids in encoded["input_ids"]:
+            seen.update(ids)
+    return seen
+
+# -------------------------------
+# 2. TOKENIZER FILES
+# -------------------------------
+
+def write_tokenizer_files(source, output, keep_ids, old_to_new):
+    """Rewrite vocab.txt, tokenizer.json and tokenizer_config.json for the reduced vocab."""
+    if (source / "vocab.txt").exists():
+        with open(source / "vocab.txt", encoding="utf-8") as f:
+            vocab = [line.rstrip("\n") for line in f]
+        with open(output / "vocab.txt", "w", encoding="utf-8") as f:
+            for old_id in keep_ids:
+                f.write(vocab[old_id] + "\n")
+
+    with open(source / "tokenizer.json", encoding="utf-8") as f:
+        tokenizer_json = json.load(f)
+    old_vocab = tokenizer_json["model"]["vocab"]
+    tokenizer_json["model"]["vocab"] = {
+        token: old_to_new[old_id] for token, old_id in old_vocab.items() if old_id in old_to_new
+    }
+    for token in tokenizer_json.get("added_tokens", []):
+        token["id"] = old_to_new[token["id"]]
+    post_processor = tokenizer_json.get("post_processor") or {}
+    for special in post_processor.get("special_tokens", {}).values():
+        special["ids"] = [old_to_new[i] for i in special["ids"]]
+    with open(output / "tokenizer.json", "w", encoding="utf-8") as f:
+        json.dump(tokenizer_json, f, ensure_ascii=False, indent=2)
+
+    with open(source / "tokenizer_config.json", encoding="utf-8") as f:
+        tokenizer_config = json.load(f)
+    tokenizer_config["added_tokens_decoder"] = {
+        str(old_to_new[int(old_id)]): token
+        for old_id, token in tokenizer_config.get("added_tokens_decoder", {}).items()
+    }
+    with open(output / "tokenizer_config.json", "w", encoding="utf-8") as f:
+        json.dump(tokenizer_config, f, ensure_ascii=False, indent=2)
+
+    special_tokens_map = source / "special_tokens_map.json"
+    if special_tokens_map.exists():
+        shutil.copy(special_tokens_map, output / "special_tokens_map.json")
+
+# -------------------------------
+# 3. MODEL
+# -------------------------------
+
+def prune_model(model, keep_ids, old_to_new):
+    """Slice the word-embedding matrix to the kept ids and update the config."""
+    old_embeddings = model.get_input_embeddings()
+    weight = old_embeddings.weight.data[torch.tensor(keep_ids)].clone()
+    pad_id = old_to_new[model.config.pad_token_id]
+
+    new_embeddings = nn.Embedding(len(keep_ids), weight.shape[1], padding_idx=pad_id)
+    new_embeddings.weight.data.copy_(weight)
+    model.set_input_embeddings(new_embeddings)
+
+    model.config.vocab_size = len(keep_ids)
+    model.config.pad_token_id = pad_id
+    return model
+
+# -------------------------------
+# 4. VERIFICATION
+# -------------------------------
+
+def logits_for(model, tokenizer, texts):
+    chunks = []
+    with torch.no_grad():
+        for start in range(0, len(texts), BATCH_SIZE):
+            inputs = tokenizer(
+                texts[start:start + BATCH_SIZE],
+                return_tensors="pt",
+                truncation=True,
+                padding=True,
+                max_length=MAX_LENGTH
+            )
+            chunks.append(model(**inputs).logits)
+    return torch.cat(chunks)
+
+def verify(source_model, source_tokenizer, output, raw_texts, old_to_new):
+    """
+    Reload the pruned checkpoint and compare token ids and predictions on
+    the corpus, starting from raw text and applying the serving preprocessing.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(output)
+    model = AutoModelForSequenceClassification.from_pretrained(output)
+    model.eval()
+    texts = serving_texts(raw_texts)
+
+    for text in texts:
+        expected = [old_to_new[i] for i in source_tokenizer(text)["input_ids"]]
+        if tokenizer(text)["input_ids"] != expected:
+            print(f"ERROR: Tokenization differs for: {text[:80]!r}")
+            return False
+
+    old_logits = logits_for(source_model, source_tokenizer, texts)
+    new_logits = logits_for(model, tokenizer, texts)
+    mismatches = (old_logits.argmax(dim=-1) != new_logits.argmax(dim=-1)).sum().item()
+    max_diff = (old_logits - new_logits).abs().max().item() if len(texts) else 0.0
+    print(f"   Predictions compared: {len(texts)}")
+    print(f"   Label mismatches: {mismatches}")
+    print(f"   Max logit difference: {max_diff:.2e}")
+    return mismatches == 0 and max_diff <= 1e-5
+
+# -------------------------------
+# 5. MAIN
+# -------------------------------
+
+def parameter_count(model):
+    return sum(p.numel() for p in model.parameters())
+
+def prune(source, output, raw_texts):
+    """
+    Write a pruned copy of ``source`` to ``output`` if it verifies.
+
+    The checkpoint is built in a temporary directory next to ``output``
+    and only moved into place once verification passes, so a failed run
+    never leaves a loadable but wrong checkpoint behind.
+
+    Returns:
+        dict with vocabulary sizes, parameter counts and "verified"
+    """
+    source, output = Path(source), Path(output)
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSequenceClassification.from_pretrained(source)
+    model.eval()
+
+    texts = serving_texts(raw_texts)
+    keep_ids = sorted(collect_token_ids(tokenizer, texts) | set(tokenizer.all_special_ids))
+    old_to_new = {old_id: new_id for new_id, old_id in enumerate(keep_ids)}
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{output.name}-", dir=output.parent))
+    try:
+        write_tokenizer_files(source, staging, keep_ids, old_to_new)
+
+        # Prune a separate copy so the original stays available for verification
+        pruned = AutoModelForSequenceClassification.from_pretrained(source)
+        pruned = prune_model(pruned, keep_ids, old_to_new)
+        pruned.save_pretrained(staging)
+
+        verified = verify(model, tokenizer, staging, raw_texts, old_to_new)
+        if verified:
+            _replace_dir(staging, output)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return {
+        "original_vocab": model.config.vocab_size,
+        "pruned_vocab": len(keep_ids),
+        "original_params": parameter_count(model),
+        "pruned_params": parameter_count(pruned),
+        "verified": verified,
+    }
+
+def _replace_dir(new, target):
+    """Move directory ``new`` to ``target``, replacing any existing directory."""
+    if not target.exists():
+        os.replace(new, target)
+        return
+    old = target.with_name(f".{target.name}-old")
+    shutil.rmtree(old, ignore_errors=True)
+    os.replace(target, old)
+    os.replace(new, target)
+    shutil.rmtree(old)
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune the model vocabulary to the tokens used by a corpus.")
+    parser.add_argument("corpus", help="CSV file or plain text file (one message per line)")
+    parser.add_argument("--text-column", default="text", help="Text column when the corpus is a CSV")
+    parser.add_argument("--source", default=str(SOURCE_MODEL_PATH), help="Checkpoint to prune")
+    parser.add_argument("--output", default=str(OUTPUT_MODEL_PATH), help="Where to write the pruned checkpoint")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    output = Path(args.output)
+    if not source.exists():
+        print(f"ERROR: Model directory not found at {source}")
+        sys.exit(1)
+    if output.resolve() == source.resolve():
+        print("ERROR: Output directory must differ from the source checkpoint")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("Prune Model Vocabulary")
+    print("=" * 60)
+
+    raw_texts = read_corpus(args.corpus, args.text_column)
+    if not raw_texts:
+        print(f"ERROR: No texts found in {args.corpus}")
+        sys.exit(1)
+    print(f"Corpus: {len(raw_texts)} texts from {args.corpus}")
+    print()
+
+    print("Pruning and verifying...")
+    result = prune(source, output, raw_texts)
+    print(f"Vocabulary: {result['original_vocab']} -> {result['pruned_vocab']} tokens")
+    print(f"Parameters: {result['original_params']:,} -> {result['pruned_params']:,}")
+    if not result["verified"]:
+        print("ERROR: Pruned model does not reproduce the original predictions; nothing was saved")
+        sys.exit(1)
+    print(f"Saved pruned checkpoint to {output}")
+    print("SUCCESS: Predictions are identical on the corpus")
+
+if __name__ == "__main__":
+    main()
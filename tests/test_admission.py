@@ -0,0 +1,203 @@
+import threading
+import time
+import unittest
+
+from app.admission import AdmissionController, BULK, DeadlineExceeded, INTERACTIVE, Overloaded
+
+
+class BlockingHandler:
+    """Handler that records payloads and blocks until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.seen = []
+
+    def __call__(self, payload):
+        self.started.set()
+        self.release.wait(5)
+        self.seen.append(payload)
+        return payload
+
+
+def submit_in_thread(controller, payload, priority, timeout=None):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = controller.submit(payload, priority, timeout)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for_queue(controller, size):
+    deadline = time.monotonic() + 2
+    while controller.stats()["queued"] != size and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+class AdmissionControllerTest(unittest.TestCase):
+
+    def test_interactive_served_before_bulk(self):
+        handler = BlockingHandler()
+        controller = AdmissionController(handler, max_queue=8)
+        blocker, _ = submit_in_thread(controller, "blocker", INTERACTIVE)
+        handler.started.wait(2)
+
+        bulk, _ = submit_in_thread(controller, "bulk", BULK)
+        wait_for_queue(controller, 1)
+        interactive, _ = submit_in_thread(controller, "interactive", INTERACTIVE)
+        wait_for_queue(controller, 2)
+
+        handler.release.set()
+        for thread in (blocker, bulk, interactive):
+            thread.join(5)
+        controller.close()
+
+        self.assertEqual(handler.seen, ["blocker", "interactive", "bulk"])
+        counts = controller.stats()["priorities"]
+        self.assertEqual(counts[INTERACTIVE]["served"], 2)
+        self.assertEqual(counts[BULK]["served"], 1)
+
+    def test_full_queue_rejects_with_retry_hint(self):
+        handler = BlockingHandler()
+        controller = AdmissionController(handler, max_queue=1)
+        blocker, _ = submit_in_thread(controller, "blocker", INTERACTIVE)
+        handler.started.wait(2)
+        queued, _ = submit_in_thread(controller, "queued", INTERACTIVE)
+        wait_for_queue(controller, 1)
+
+        with self.assertRaises(Overloaded) as context:
+            controller.submit("rejected", INTERACTIVE)
+        self.assertGreaterEqual(context.exception.retry_after, 1.0)
+
+        handler.release.set()
+        blocker.join(5)
+        queued.join(5)
+        controller.close()
+        self.assertEqual(controller.stats()["priorities"][INTERACTIVE]["rejected"], 1)
+
+    def test_interactive_evicts_queued_bulk(self):
+        handler = BlockingHandler()
+        controller = AdmissionController(handler, max_queue=1)
+        blocker, _ = submit_in_thread(controller, "blocker", INTERACTIVE)
+        handler.started.wait(2)
+        bulk, bulk_outcome = submit_in_thread(controller, "bulk", BULK)
+        wait_for_queue(controller, 1)
+
+        interactive, interactive_outcome = submit_in_thread(controller, "interactive", INTERACTIVE)
+        bulk.join(5)
+        self.assertIsInstance(bulk_outcome.get("error"), Overloaded)
+
+        handler.release.set()
+        blocker.join(5)
+        interactive.join(5)
+        controller.close()
+
+        self.assertEqual(interactive_outcome.get("result"), "interactive")
+        counts = controller.stats()["priorities"]
+        self.assertEqual(counts[BULK]["evicted"], 1)
+        self.assertEqual(counts[BULK]["served"], 0)
+
+    def test_queued_request_times_out_without_running(self):
+        handler = BlockingHandler()
+        controller = AdmissionController(handler, max_queue=8)
+        blocker, _ = submit_in_thread(controller, "blocker", INTERACTIVE)
+        handler.started.wait(2)
+
+        with self.assertRaises(DeadlineExceeded):
+            controller.submit("expires", INTERACTIVE, timeout=0.05)
+
+        handler.release.set()
+        blocker.join(5)
+        controller.close()
+
+        self.assertEqual(handler.seen, ["blocker"])
+        counts = controller.stats()["priorities"][INTERACTIVE]
+        self.assertEqual(counts["timed_out"], 1)
+        self.assertEqual(counts["served"], 1)
+
+    def test_result_after_caller_left_counts_as_late(self):
+        controller = AdmissionController(lambda payload: time.sleep(0.2) or payload)
+
+        with self.assertRaises(DeadlineExceeded):
+            controller.submit("slow", INTERACTIVE, timeout=0.1)
+        time.sleep(0.3)
+        controller.close()
+
+        counts = controller.stats()["priorities"][INTERACTIVE]
+        self.assertEqual(counts["late"], 1)
+        self.assertEqual(counts["served"], 0)
+        self.assertEqual(counts["timed_out"], 0)
+
+    def test_counters_match_caller_outcomes(self):
+        controller = AdmissionController(lambda payload: time.sleep(0.1) or payload)
+        threads = [submit_in_thread(controller, i, INTERACTIVE, timeout=0.15) for i in range(4)]
+        for thread, _ in threads:
+            thread.join(5)
+        time.sleep(0.2)
+        controller.close()
+
+        delivered = sum("result" in outcome for _, outcome in threads)
+        counts = controller.stats()["priorities"][INTERACTIVE]
+        self.assertEqual(counts["served"], delivered)
+        self.assertEqual(
+            counts["served"] + counts["late"] + counts["timed_out"] + counts["expired"], 4
+        )
+
+    def test_slow_bulk_work_does_not_expire_fast_interactive_work(self):
+        started = threading.Event()
+
+        def handler(seconds):
+            started.set()
+            time.sleep(seconds)
+            return seconds
+
+        controller = AdmissionController(handler, max_queue=8)
+        for _ in range(5):
+            controller.submit(0.4, BULK)
+        for _ in range(3):
+            controller.submit(0.01, INTERACTIVE)
+
+        # A fast request queued behind a running slow one still has time left
+        started.clear()
+        bulk, _ = submit_in_thread(controller, 0.4, BULK)
+        started.wait(2)
+        self.assertEqual(controller.submit(0.01, INTERACTIVE, timeout=0.6), 0.01)
+        bulk.join(5)
+
+        stats = controller.stats()
+        self.assertGreater(stats["service_time_ms"][BULK], 250)
+        self.assertLess(stats["service_time_ms"][INTERACTIVE], 50)
+        self.assertEqual(stats["priorities"][INTERACTIVE]["served"], 4)
+        self.assertEqual(stats["priorities"][INTERACTIVE]["expired"], 0)
+
+        # Queued bulk work only lengthens the retry hint for bulk requests
+        started.clear()
+        blocker, _ = submit_in_thread(controller, 0.4, BULK)
+        started.wait(2)
+        queued = [submit_in_thread(controller, 0.4, BULK) for _ in range(6)]
+        wait_for_queue(controller, 6)
+        retry_after = controller.stats()["retry_after"]
+        self.assertGreaterEqual(retry_after[BULK], 1.5)
+        self.assertEqual(retry_after[INTERACTIVE], 1.0)
+
+        controller.close()
+        blocker.join(5)
+        for thread, outcome in queued:
+            thread.join(5)
+            self.assertIsInstance(outcome.get("error"), Overloaded)
+
+    def test_unknown_priority(self):
+        controller = AdmissionController(lambda payload: payload)
+        with self.assertRaises(ValueError):
+            controller.submit("x", "urgent")
+        controller.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
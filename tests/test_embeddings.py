@@ -0,0 +1,93 @@
+import importlib.util
+import tempfile
+import unittest
+
+HAS_DEPS = all(importlib.util.find_spec(name) for name in ("numpy", "torch"))
+
+if HAS_DEPS:
+    import numpy as np
+    from app.embeddings import VectorIndex
+
+
+def anisotropic_vectors(n, dim=768, seed=0):
+    """Vectors sharing a dominant direction, so pairwise cosines sit near 0.9."""
+    rng = np.random.default_rng(seed)
+    common = rng.normal(size=dim)
+    return common + 0.35 * rng.normal(size=(n, dim)) * np.linalg.norm(common) / np.sqrt(dim)
+
+
+def exact_top_k(vectors, query, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    return np.argsort(-scores)[:k]
+
+
+@unittest.skipUnless(HAS_DEPS, "numpy and torch are required")
+class VectorIndexTest(unittest.TestCase):
+
+    def test_search_finds_added_vector(self):
+        vectors = np.random.default_rng(1).normal(size=(50, 16))
+        for dtype in ("float16", "int8"):
+            index = VectorIndex(16, dtype=dtype)
+            index.add(vectors[:20])
+            index.add(vectors[20:], ids=np.arange(100, 130))
+            self.assertEqual(len(index), 50)
+
+            scores, ids = index.search(vectors[[3, 25]], k=3)
+            self.assertEqual(scores.shape, (2, 3))
+            self.assertEqual(ids[0, 0], 3)
+            self.assertEqual(ids[1, 0], 105)
+            self.assertAlmostEqual(float(scores[0, 0]), 1.0, places=2)
+            self.assertTrue(np.all(np.diff(scores, axis=1) <= 0))
+
+    def test_empty_index_and_small_k(self):
+        index = VectorIndex(8)
+        scores, ids = index.search(np.ones(8), k=5)
+        self.assertEqual(scores.shape, (1, 0))
+        index.add(np.ones((2, 8)))
+        scores, ids = index.search(np.ones(8), k=5)
+        self.assertEqual(ids.shape, (1, 2))
+
+    def test_int8_keeps_ranking_of_anisotropic_embeddings(self):
+        vectors = anisotropic_vectors(500)
+        queries = anisotropic_vectors(20, seed=1)
+        index = VectorIndex(768, dtype="int8")
+        index.add(vectors)
+
+        overlap = []
+        for query in queries:
+            _, ids = index.search(query, k=10)
+            overlap.append(len(set(ids[0]) & set(exact_top_k(vectors, query, 10))))
+        self.assertGreaterEqual(np.mean(overlap), 9.0)
+
+    def test_save_load_round_trip(self):
+        vectors = np.random.default_rng(2).normal(size=(30, 16))
+        for dtype in ("float16", "int8"):
+            with tempfile.TemporaryDirectory() as tmp:
+                index = VectorIndex(16, dtype=dtype)
+                index.add(vectors[:20], ids=np.arange(1000, 1020))
+                expected = index.search(vectors[:5], k=4)
+                index.save(tmp)
+
+                loaded = VectorIndex.load(tmp, mmap=True)
+                self.assertEqual(len(loaded), 20)
+                scores, ids = loaded.search(vectors[:5], k=4)
+                np.testing.assert_array_equal(ids, expected[1])
+                np.testing.assert_allclose(scores, expected[0], rtol=1e-6)
+
+                # Grow the memory-mapped index and save it over its own files
+                loaded.add(vectors[20:], ids=np.arange(2000, 2010))
+                loaded.save(tmp)
+                reloaded = VectorIndex.load(tmp, mmap=False)
+                self.assertEqual(len(reloaded), 30)
+                _, ids = reloaded.search(vectors[[0, 25]], k=1)
+                self.assertEqual(ids[:, 0].tolist(), [1000, 2005])
+
+                # Saving a memory-mapped index unchanged onto its own path
+                mapped = VectorIndex.load(tmp, mmap=True)
+                mapped.save(tmp)
+                np.testing.assert_array_equal(VectorIndex.load(tmp).ids, reloaded.ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
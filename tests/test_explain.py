@@ -0,0 +1,106 @@
+import importlib.util
+import unittest
+from pathlib import Path
+from unittest import mock
+
+HAS_DEPS = all(importlib.util.find_spec(name) for name in ("torch", "transformers"))
+
+if HAS_DEPS:
+    import torch
+    import torch.nn.functional as F
+    from transformers import AutoTokenizer, DistilBertConfig, DistilBertForSequenceClassification
+
+    from app import explain
+
+TOKENIZER_DIR = Path(__file__).resolve().parent.parent / "models" / "base_model" / "mh_3class_distil_final"
+
+TEXTS = [
+    "i have been feeling overwhelmed and sleepless lately",
+    "had a great day at the park",
+    "nothing feels worth doing anymore",
+]
+
+
+@unittest.skipUnless(HAS_DEPS, "torch and transformers are required")
+class ExplainTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        config = DistilBertConfig(
+            vocab_size=30522, dim=32, hidden_dim=64, n_layers=2, n_heads=2, num_labels=3,
+            initializer_range=0.2,  # Larger weights so the prediction depends visibly on the words
+        )
+        cls.model = DistilBertForSequenceClassification(config).eval()
+        cls.tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_DIR)
+
+    def setUp(self):
+        explain.clear_cache()
+
+    def test_attributions_sum_to_probability_change(self):
+        text = TEXTS[0]
+        result = explain.explain_text(self.model, self.tokenizer, text, n_steps=64)
+
+        encoding = self.tokenizer([text], return_tensors="pt")
+        with torch.no_grad():
+            baseline = explain._baseline_embeddings(self.model, encoding["input_ids"], self.tokenizer)
+            baseline_logits = self.model(
+                inputs_embeds=baseline, attention_mask=encoding["attention_mask"]
+            ).logits
+        target = result["label_index"]
+        expected = result["probabilities"][target] - F.softmax(baseline_logits, dim=-1)[0, target].item()
+
+        total = sum(score for _, score in result["words"])
+        self.assertGreater(abs(expected), 1e-3)
+        self.assertAlmostEqual(total, expected, delta=0.05 * abs(expected))
+
+    def test_results_do_not_depend_on_batch_size(self):
+        large = explain.explain_texts(self.model, self.tokenizer, TEXTS, batch_size=64)
+        explain.clear_cache()
+        small = explain.explain_texts(self.model, self.tokenizer, TEXTS, batch_size=7)
+
+        for a, b in zip(large, small):
+            self.assertEqual(a["label_index"], b["label_index"])
+            self.assertEqual([w for w, _ in a["words"]], [w for w, _ in b["words"]])
+            for (_, score_a), (_, score_b) in zip(a["words"], b["words"]):
+                self.assertAlmostEqual(score_a, score_b, places=5)
+
+    def test_words_match_cleaned_words(self):
+        results = explain.explain_texts(self.model, self.tokenizer, TEXTS)
+        for text, result in zip(TEXTS, results):
+            self.assertEqual([w for w, _ in result["words"]], text.split())
+            self.assertEqual(self.model.config.id2label[result["label_index"]], result["label"])
+
+        # Subword pieces are summed onto their word
+        text = "sleepless overwhelmed"
+        encoding = self.tokenizer([text], return_tensors="pt")
+        word_ids = encoding.word_ids(0)
+        self.assertGreater(sum(w == 0 for w in word_ids) + sum(w == 1 for w in word_ids), 2)
+        token_scores = torch.arange(len(word_ids), dtype=torch.float)
+        words = explain._words_from_tokens(text, encoding, 0, token_scores)
+        expected = [
+            float(sum(i for i, w in enumerate(word_ids) if w == word)) for word in range(2)
+        ]
+        self.assertEqual(words, list(zip(text.split(), expected)))
+
+    def test_repeat_call_is_a_cache_hit(self):
+        first = explain.explain_text(self.model, self.tokenizer, TEXTS[1])
+        with mock.patch.object(self.model, "forward", side_effect=AssertionError("model called")):
+            second = explain.explain_text(self.model, self.tokenizer, TEXTS[1])
+        self.assertIs(second, first)
+
+        # A different step budget is a different explanation
+        third = explain.explain_text(self.model, self.tokenizer, TEXTS[1], n_steps=5)
+        self.assertIsNot(third, first)
+
+    def test_highlight_escapes_words(self):
+        rendered = explain.highlight_html([("<script>&", 0.5), ("calm", -0.25)])
+        self.assertNotIn("<script>", rendered)
+        self.assertIn("&lt;script&gt;&amp;", rendered)
+        self.assertEqual(rendered.count("<span"), 2)
+        self.assertIn("rgba(231, 76, 60, 1.00)", rendered)
+        self.assertIn("rgba(52, 152, 219, 0.50)", rendered)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import importlib.util
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+HAS_DEPS = importlib.util.find_spec("torch") is not None
+ROOT = Path(__file__).resolve().parent.parent
+
+if HAS_DEPS:
+    import torch
+    from app import profiling
+
+
+def inference_call():
+    with profiling.capture():
+        with profiling.region("model_forward"):
+            x = torch.randn(16, 64)
+            for _ in range(20):
+                x = torch.nn.functional.gelu(x @ torch.randn(64, 64))
+            return x.sum().item()
+
+
+@unittest.skipUnless(HAS_DEPS, "torch is required")
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(profiling, "PROFILE_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(profiling.disarm)
+
+    def run_in_thread(self, calls, errors):
+        def run():
+            try:
+                for _ in range(calls):
+                    inference_call()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_disabled_capture_is_a_shared_no_op(self):
+        self.assertFalse(profiling.is_armed())
+        self.assertIs(profiling.capture(), profiling.capture())
+        inference_call()
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+    def test_calls_captured_across_threads(self):
+        profiling.arm(4)
+        errors = []
+        threads = [self.run_in_thread(3, errors) for _ in range(2)]
+        for thread in threads:
+            thread.join(30)
+
+        self.assertEqual(errors, [])
+        self.assertFalse(profiling.is_armed())
+        self.assertIsNone(profiling._session)
+
+        files = {path.name.split("_")[0] for path in Path(self.tmp.name).iterdir()}
+        self.assertEqual(files, {"trace", "torch", "python", "operators"})
+        self.assertEqual(len(list(Path(self.tmp.name).glob("trace_*.json"))), 4)
+        operators = next(Path(self.tmp.name).glob("operators_*.txt")).read_text()
+        self.assertIn("over 4 calls", operators)
+        self.assertIn("aten::mm", operators)
+        self.assertIn("model_forward", operators)
+        self.assertTrue(next(Path(self.tmp.name).glob("torch_stacks_*.folded")).read_text())
+
+    def test_disarm_finishes_open_session(self):
+        profiling.arm(3)
+        inference_call()
+        self.assertIsNotNone(profiling._session)
+        sampler = profiling._session.sampler
+
+        profiling.disarm()
+        self.assertFalse(profiling.is_armed())
+        self.assertIsNone(profiling._session)
+        self.assertFalse(sampler._thread.is_alive())
+        operators = next(Path(self.tmp.name).glob("operators_*.txt")).read_text()
+        self.assertIn("over 1 calls", operators)
+
+        inference_call()
+        self.assertEqual(len(list(Path(self.tmp.name).glob("trace_*.json"))), 1)
+
+    @unittest.skipUnless(hasattr(signal, "SIGUSR1"), "POSIX signals are required")
+    def test_import_starts_nothing_until_init(self):
+        module = "app.utils" if all(
+            importlib.util.find_spec(name) for name in ("pandas", "sklearn", "transformers")
+        ) else "app.profiling"
+        script = f"""
+import signal, threading
+import {module}
+from app import profiling
+
+def watchers():
+    return [t for t in threading.enumerate() if t.name == "profile-trigger"]
+
+assert not watchers(), "watcher started on import"
+assert signal.getsignal(signal.SIGUSR1) is signal.SIG_DFL, "SIGUSR1 taken on import"
+profiling.init()
+profiling.init()
+assert len(watchers()) == 1, watchers()
+assert signal.getsignal(signal.SIGUSR1) is profiling._handle_signal
+"""
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+    def test_trigger_file_arms_profiling(self):
+        trigger = Path(self.tmp.name) / "arm"
+        with mock.patch.object(profiling, "TRIGGER_POLL", 0.01), \
+                mock.patch.object(profiling, "_watcher", None):
+            self.assertTrue(profiling.start_trigger_watcher(trigger))
+            trigger.write_text("2\n")
+            deadline = time.monotonic() + 5
+            while trigger.exists() and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertFalse(trigger.exists())
+        self.assertEqual(profiling._remaining, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
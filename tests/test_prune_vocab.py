@@ -0,0 +1,109 @@
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+HAS_DEPS = all(
+    importlib.util.find_spec(name) for name in ("torch", "transformers", "pandas", "sklearn")
+)
+
+if HAS_DEPS:
+    import torch
+    from transformers import (
+        AutoModelForSequenceClassification,
+        AutoTokenizer,
+        DistilBertConfig,
+        DistilBertForSequenceClassification,
+    )
+
+    import prune_vocab
+
+TOKENIZER_DIR = Path(__file__).resolve().parent.parent / "models" / "base_model" / "mh_3class_distil_final"
+TOKENIZER_FILES = ["tokenizer.json", "tokenizer_config.json", "special_tokens_map.json", "vocab.txt"]
+
+CORPUS = [
+    "I've been feeling really stressed lately with all the work deadlines!!",
+    "Had a great day at the park :) 10/10 would go again",
+    "@friend I can't sleep and nothing feels worth doing anymore... http://example.com",
+    "exams next week, panicking about failing",
+]
+
+
+@unittest.skipUnless(HAS_DEPS, "torch, transformers, pandas and scikit-learn are required")
+class PruneVocabTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.source = self.tmp / "source"
+        self.output = self.tmp / "pruned"
+        self.source.mkdir()
+        for name in TOKENIZER_FILES:
+            shutil.copy(TOKENIZER_DIR / name, self.source / name)
+
+        torch.manual_seed(0)
+        config = DistilBertConfig(
+            vocab_size=30522, dim=32, hidden_dim=64, n_layers=2, n_heads=2, num_labels=3
+        )
+        DistilBertForSequenceClassification(config).save_pretrained(self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def logits(self, path, texts):
+        tokenizer = AutoTokenizer.from_pretrained(path)
+        model = AutoModelForSequenceClassification.from_pretrained(path)
+        model.eval()
+        return prune_vocab.logits_for(model, tokenizer, prune_vocab.serving_texts(texts))
+
+    def test_pruned_checkpoint_matches_original(self):
+        result = prune_vocab.prune(self.source, self.output, CORPUS)
+
+        self.assertTrue(result["verified"])
+        self.assertLess(result["pruned_vocab"], 100)
+        self.assertLess(result["pruned_params"], result["original_params"])
+        for name in TOKENIZER_FILES:
+            self.assertTrue((self.output / name).exists(), name)
+
+        torch.testing.assert_close(
+            self.logits(self.output, CORPUS), self.logits(self.source, CORPUS), rtol=0, atol=1e-6
+        )
+
+    def test_failed_verification_writes_nothing(self):
+        with mock.patch.object(prune_vocab, "verify", return_value=False):
+            result = prune_vocab.prune(self.source, self.output, CORPUS)
+        self.assertFalse(result["verified"])
+        self.assertFalse(self.output.exists())
+
+        # An existing checkpoint is left untouched
+        self.output.mkdir()
+        (self.output / "config.json").write_text("{}")
+        with mock.patch.object(prune_vocab, "verify", return_value=False):
+            prune_vocab.prune(self.source, self.output, CORPUS)
+        self.assertEqual(sorted(p.name for p in self.output.iterdir()), ["config.json"])
+        self.assertEqual(sorted(p.name for p in self.tmp.iterdir()), ["pruned", "source"])
+
+    def test_verified_checkpoint_replaces_existing_output(self):
+        self.output.mkdir()
+        (self.output / "stale.bin").write_text("stale")
+        self.assertTrue(prune_vocab.prune(self.source, self.output, CORPUS)["verified"])
+
+        self.assertFalse((self.output / "stale.bin").exists())
+        self.assertTrue((self.output / "config.json").exists())
+        self.assertEqual(sorted(p.name for p in self.tmp.iterdir()), ["pruned", "source"])
+
+    def test_special_and_unseen_tokens(self):
+        prune_vocab.prune(self.source, self.output, CORPUS)
+        tokenizer = AutoTokenizer.from_pretrained(self.output)
+
+        self.assertEqual(tokenizer.pad_token_id, 0)
+        ids = tokenizer("stressed zebra")["input_ids"]
+        self.assertEqual(ids[0], tokenizer.cls_token_id)
+        self.assertEqual(ids[-1], tokenizer.sep_token_id)
+        self.assertIn(tokenizer.unk_token_id, ids)
+        self.assertNotEqual(ids[1], tokenizer.unk_token_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import importlib.util
+import multiprocessing
+import threading
+import unittest
+from types import SimpleNamespace
+
+HAS_DEPS = importlib.util.find_spec("torch") is not None
+
+if HAS_DEPS:
+    import numpy as np
+    import torch
+    from torch import nn
+
+    from app.serving import ModelRegistry, ModelStats, _ShadowWorker
+
+    class FixedModel(nn.Module):
+        """Returns fixed logits and records whether the primary was marked busy."""
+
+        def __init__(self, logits, registry_ref):
+            super().__init__()
+            self.weight = nn.Parameter(torch.zeros(1))
+            self.logits = logits
+            self.registry_ref = registry_ref
+            self.busy_seen = []
+
+        def forward(self, input_ids, attention_mask):
+            self.busy_seen.append(self.registry_ref[0]._primary_busy.value)
+            return SimpleNamespace(logits=self.logits[:input_ids.shape[0]])
+
+
+class FakeShadow:
+    def __init__(self):
+        self.jobs = []
+        self.stats = ModelStats()
+
+    def submit(self, inputs, primary_probs):
+        self.jobs.append((inputs, primary_probs))
+
+    def pending(self):
+        return 0
+
+
+def make_worker(queue_size):
+    """A _ShadowWorker wired to local queues, without starting a process."""
+    context = multiprocessing.get_context("spawn")
+    worker = _ShadowWorker.__new__(_ShadowWorker)
+    worker.name = "test"
+    worker.stats = ModelStats()
+    worker._jobs = context.Queue(maxsize=queue_size)
+    worker._results = context.Queue()
+    return worker
+
+
+@unittest.skipUnless(HAS_DEPS, "torch is required")
+class ModelStatsTest(unittest.TestCase):
+
+    def test_percentiles(self):
+        stats = ModelStats()
+        self.assertEqual(stats.snapshot()["p99_ms"], 0.0)
+        for ms in range(100, 0, -1):
+            stats.record_latency(ms / 1000)
+
+        summary = stats.snapshot()
+        self.assertEqual(summary["calls"], 100)
+        self.assertAlmostEqual(summary["p50_ms"], 51.0)
+        self.assertAlmostEqual(summary["p99_ms"], 100.0)
+
+    def test_latency_window(self):
+        stats = ModelStats(window=10)
+        for ms in range(100):
+            stats.record_latency(ms / 1000)
+        summary = stats.snapshot()
+        self.assertEqual(summary["calls"], 100)
+        self.assertAlmostEqual(summary["p50_ms"], 95.0)
+
+    def test_disagreement_rate(self):
+        stats = ModelStats()
+        primary = torch.tensor([[0.7, 0.2, 0.1], [0.1, 0.8, 0.1], [0.2, 0.2, 0.6], [0.5, 0.3, 0.2]])
+        shadow = torch.tensor([[0.6, 0.3, 0.1], [0.5, 0.4, 0.1], [0.2, 0.2, 0.6], [0.5, 0.3, 0.2]])
+        stats.record_comparison(shadow, primary)
+
+        summary = stats.snapshot()
+        self.assertEqual(summary["compared"], 4)
+        self.assertAlmostEqual(summary["disagreement_rate"], 0.25)
+        self.assertAlmostEqual(summary["mean_prob_diff"], (0.2 + 0.8) / 4, places=6)
+
+
+@unittest.skipUnless(HAS_DEPS, "torch is required")
+class ShadowWorkerTest(unittest.TestCase):
+
+    def test_full_queue_drops_jobs(self):
+        worker = make_worker(queue_size=2)
+        inputs = {"input_ids": torch.ones(1, 4, dtype=torch.long)}
+        for _ in range(5):
+            worker.submit(inputs, torch.tensor([[0.5, 0.3, 0.2]]))
+
+        self.assertEqual(worker.stats.snapshot()["dropped"], 3)
+        queued_inputs, _ = worker._jobs.get(timeout=5)
+        np.testing.assert_array_equal(queued_inputs["input_ids"], np.ones((1, 4)))
+
+    def test_collector_records_results(self):
+        worker = make_worker(queue_size=2)
+        primary = np.array([[0.7, 0.2, 0.1]], dtype=np.float32)
+        worker._results.put(("done", 0.01, np.array([[0.1, 0.8, 0.1]], dtype=np.float32), primary))
+        worker._results.put(("done", 0.03, primary, primary))
+        worker._results.put(("preempted",))
+        worker._results.put(("error", "boom"))
+        worker._results.put(None)
+        worker._collect()
+
+        summary = worker.stats.snapshot()
+        self.assertEqual(summary["calls"], 2)
+        self.assertEqual(summary["compared"], 2)
+        self.assertAlmostEqual(summary["disagreement_rate"], 0.5)
+        self.assertEqual(summary["preempted"], 1)
+        self.assertEqual(summary["errors"], 1)
+
+
+@unittest.skipUnless(HAS_DEPS, "torch is required")
+class ModelRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        ref = []
+        self.model = FixedModel(torch.tensor([[2.0, 0.0, 0.0], [0.0, 2.0, 0.0]]), ref)
+        self.registry = ModelRegistry("primary", self.model)
+        ref.append(self.registry)
+
+    def test_in_flight_counting(self):
+        busy = self.registry._primary_busy
+        self.registry._enter_primary()
+        self.registry._enter_primary()
+        self.assertEqual(busy.value, 1)
+        self.registry._exit_primary()
+        self.assertEqual(busy.value, 1)
+        self.registry._exit_primary()
+        self.assertEqual(busy.value, 0)
+
+        barrier = threading.Barrier(8)
+
+        def call():
+            barrier.wait()
+            for _ in range(200):
+                self.registry._enter_primary()
+                self.registry._exit_primary()
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.registry._in_flight, 0)
+        self.assertEqual(busy.value, 0)
+
+    def test_predict_marks_primary_busy_and_fans_out(self):
+        shadow = FakeShadow()
+        self.registry.shadows["shadow"] = shadow
+        inputs = {
+            "input_ids": torch.ones(2, 3, dtype=torch.long),
+            "attention_mask": torch.ones(2, 3, dtype=torch.long),
+        }
+        probs = self.registry.predict(inputs)
+
+        self.assertEqual(self.model.busy_seen, [1])
+        self.assertEqual(self.registry._primary_busy.value, 0)
+        self.assertEqual(probs.argmax(dim=-1).tolist(), [0, 1])
+        self.assertEqual(len(shadow.jobs), 1)
+        self.assertIs(shadow.jobs[0][1], probs)
+        stats = self.registry.stats()
+        self.assertEqual(stats["primary"]["calls"], 1)
+        self.assertEqual(stats["shadow"]["role"], "shadow")
+
+    def test_primary_marked_idle_after_failure(self):
+        with self.assertRaises(TypeError):
+            self.registry.predict({"unexpected": torch.ones(1, 1)})
+        self.assertEqual(self.registry._in_flight, 0)
+        self.assertEqual(self.registry._primary_busy.value, 0)
+
+    def test_add_shadow_refuses_duplicate_names(self):
+        self.registry.shadows["shadow"] = FakeShadow()
+        with self.assertRaises(ValueError):
+            self.registry.add_shadow("shadow", "unused/path")
+        with self.assertRaises(ValueError):
+            self.registry.add_shadow("primary", "unused/path")
+
+
+if __name__ == "__main__":
+    unittest.main()